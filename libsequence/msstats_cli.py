@@ -1,14 +1,24 @@
 # Python replacement for the C++ version of msstats.
 from __future__ import print_function
 import argparse
+import io
+import sys
 import libsequence
 import libsequence.polytable as pt
 import libsequence.summstats as sstats
 import libsequence.citations as citations
 import sqlite3
 import collections
+import multiprocessing
 import pandas as pd
 
+# Number of replicates read from stdin before
+# they are handed off for processing.
+BATCH_SIZE = 256
+
+# Size of the buffer used for text output
+OUTPUT_BUFFER_SIZE = 1 << 20
+
 
 def make_parser():
     parser = argparse.ArgumentParser(description='Calculate summary statistics from data in "ms"-format',
@@ -23,7 +33,10 @@ def make_parser():
     parser.add_argument("--garud", "-g", action='store_true',
                         help="Calculate H1, H12, etc.")
     parser.add_argument("--outfile", "-o", type=str,
-                        help="sqlite3 output file name")
+                        help="sqlite3 output file name.  If omitted, a "
+                        "tab-delimited table is written to standard output.")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of worker processes.")
     return parser
 
 
@@ -32,6 +45,11 @@ ClassicStats = collections.namedtuple('ClassicStats', ['rep',
 GarudStatsT = collections.namedtuple(
     'GarudStatsT', ['rep', 'H1', 'H12', 'H2H1'])
 
+# Row formats for text output, built once
+# from the fixed fields above.
+CLASSIC_FORMAT = '{0}\t{1:.6g}\t{2:.6g}\t{3:.6g}\t{4:.6g}\t{5}\t{6}\t{7}'
+GARUD_FORMAT = '\t{1:.6g}\t{2:.6g}\t{3:.6g}'
+
 
 def classic_stats(d,rep):
     ad = sstats.PolySIM(d)
@@ -44,21 +62,89 @@ def classic_stats(d,rep):
                         ad.numexternalmutations())
 
 
+def replicate_stats(task):
+    d, rep, garud = task
+    gstats = None
+    if garud is True:
+        g = sstats.garudStats(d)
+        gstats = GarudStatsT(rep, g['H1'], g['H12'], g['H2H1'])
+    return classic_stats(d, rep), gstats
+
+
+def read_batch(first_rep, garud):
+    """
+    Read up to BATCH_SIZE replicates from stdin.
+    """
+    batch = []
+    while len(batch) < BATCH_SIZE:
+        d = pt.SimData()
+        if d.from_stdin() is not True:
+            break
+        batch.append((d, first_rep + len(batch), garud))
+    return batch
+
+
 def msstats_main(arg_list=None):
     parser = make_parser()
     args = parser.parse_args(arg_list)
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
 
-    d = pt.SimData()
+    pool = None
+    if args.jobs > 1:
+        # ProcessPoolExecutor only accepts a start
+        # method from Python 3.7 onwards.
+        pool = multiprocessing.get_context('spawn').Pool(args.jobs)
     classic_stats_list = []
     garud_stats_list = []
-    rep = 0
-    while d.from_stdin() is True:
-        classic_stats_list.append(classic_stats(d,rep))
+    out = None
+    if args.outfile is None:
+        # Write to stdout's file descriptor through a large
+        # buffer, rather than one print() per replicate.
+        # When sys.stdout has no file descriptor (e.g.,
+        # it has been redirected within Python), rows are
+        # written to it directly.
+        sys.stdout.flush()
+        try:
+            out = io.open(sys.stdout.fileno(), 'w',
+                          buffering=OUTPUT_BUFFER_SIZE, closefd=False)
+        except (AttributeError, io.UnsupportedOperation):
+            out = sys.stdout
+        header = '\t'.join(ClassicStats._fields)
         if args.garud is True:
-            gstats = sstats.garudStats(d)
-            garud_stats_list.append(GarudStatsT(
-                rep, gstats['H1'], gstats['H12'], gstats['H2H1']))
-        rep += 1
+            header += '\t' + '\t'.join(GarudStatsT._fields[1:])
+        out.write(header + '\n')
+    rep = 0
+    try:
+        # Input is read serially, and each batch of
+        # replicates is processed in parallel.
+        # Output order matches input order.
+        batch = read_batch(rep, args.garud)
+        while len(batch) > 0:
+            if pool is None:
+                results = map(replicate_stats, batch)
+            else:
+                results = pool.imap(replicate_stats, batch, chunksize=16)
+            for classic, gstats in results:
+                if out is not None:
+                    out.write(CLASSIC_FORMAT.format(*classic))
+                    if gstats is not None:
+                        out.write(GARUD_FORMAT.format(*gstats))
+                    out.write('\n')
+                    continue
+                classic_stats_list.append(classic)
+                if gstats is not None:
+                    garud_stats_list.append(gstats)
+            rep += len(batch)
+            batch = read_batch(rep, args.garud)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if out is not None:
+            out.flush()
+    if out is not None:
+        return
     df = pd.DataFrame(classic_stats_list).set_index('rep')
     if len(garud_stats_list) > 0:
         gdf = pd.DataFrame(garud_stats_list).set_index('rep')
@@ -0,0 +1,249 @@
+#ifndef PYLIBSEQ_BITPACKED_MATRIX_HPP__
+#define PYLIBSEQ_BITPACKED_MATRIX_HPP__
+
+#include <algorithm>
+#include <cstdint>
+#include <cstdlib>
+#include <cstring>
+#include <memory>
+#include <new>
+#include <stdexcept>
+#include <vector>
+#include <Sequence/VariantMatrix.hpp>
+#ifdef _WIN32
+#include <malloc.h>
+#endif
+
+// Set bit j of dst to src[j], for j in [0, n).  The
+// return value is nonzero if any element of src is
+// neither 0 nor 1.  Bytes are handled eight at a time,
+// gathering the low bit of each into the top byte of a
+// single 64-bit product.
+inline std::uint64_t
+pack_row(const std::int8_t* src, std::size_t n, std::uint64_t* dst)
+{
+    std::uint64_t invalid = 0;
+    std::size_t i = 0;
+#if defined(__BYTE_ORDER__) && __BYTE_ORDER__ == __ORDER_LITTLE_ENDIAN__
+    for (; i + 8 <= n; i += 8)
+        {
+            std::uint64_t x;
+            std::memcpy(&x, src + i, sizeof(x));
+            invalid |= x & 0xfefefefefefefefeULL;
+            dst[i >> 6] |= ((x * 0x0102040810204080ULL) >> 56) << (i & 63);
+        }
+#endif
+    for (; i < n; ++i)
+        {
+            const std::uint64_t x = static_cast<std::uint8_t>(src[i]);
+            invalid |= x & 0xfe;
+            dst[i >> 6] |= (x & 1) << (i & 63);
+        }
+    return invalid;
+}
+
+// Variant-major, bit-packed copy of 0/1 genotype data.
+// Sample j of site i is bit (j % 64) of word (j / 64)
+// of row i.  Rows are padded so that each one starts on
+// a 32-byte boundary, meaning that 256-bit loads never
+// straddle two sites.
+class BitPackedMatrix
+{
+  public:
+    static constexpr std::size_t alignment = 32;
+    static constexpr std::size_t words_per_block
+        = alignment / sizeof(std::uint64_t);
+
+  private:
+    struct aligned_deleter
+    {
+        void
+        operator()(std::uint64_t* p) const
+        {
+#ifdef _WIN32
+            _aligned_free(p);
+#else
+            std::free(p);
+#endif
+        }
+    };
+    using storage_t = std::unique_ptr<std::uint64_t[], aligned_deleter>;
+
+    std::size_t nsites_, nsam_, nwords_, stride_;
+    storage_t words_;
+
+    static storage_t
+    allocate(std::size_t nwords)
+    {
+        // Always allocate at least one aligned block
+        // so that data() is never null.  The comparison
+        // is written out because std::max would bind a
+        // reference to words_per_block, which has no
+        // out-of-line definition before C++17.
+        const std::size_t bytes
+            = (nwords < words_per_block ? words_per_block : nwords)
+              * sizeof(std::uint64_t);
+        void* p = nullptr;
+#ifdef _WIN32
+        p = _aligned_malloc(bytes, alignment);
+#else
+        if (posix_memalign(&p, alignment, bytes) != 0)
+            {
+                p = nullptr;
+            }
+#endif
+        if (p == nullptr)
+            {
+                throw std::bad_alloc();
+            }
+        std::memset(p, 0, bytes);
+        return storage_t(static_cast<std::uint64_t*>(p));
+    }
+
+  public:
+    BitPackedMatrix(std::size_t nsites, std::size_t nsam)
+        : nsites_(nsites), nsam_(nsam), nwords_((nsam + 63) / 64),
+          // Wind each row forward to the next 32-byte boundary
+          stride_(((nwords_ + words_per_block - 1) / words_per_block)
+                  * words_per_block),
+          words_(allocate(nsites_ * stride_))
+    {
+    }
+
+    explicit BitPackedMatrix(const Sequence::VariantMatrix& m)
+        : BitPackedMatrix(m.nsites(), m.nsam())
+    {
+        const std::int8_t* src = m.cdata();
+        std::uint64_t invalid = 0;
+        for (std::size_t site = 0; site < nsites_; ++site, src += nsam_)
+            {
+                invalid |= pack_row(src, nsam_, row(site));
+            }
+        if (invalid != 0)
+            {
+                throw std::invalid_argument(
+                    "bit packing requires data encoded as 0/1");
+            }
+    }
+
+    BitPackedMatrix(BitPackedMatrix&&) = default;
+    BitPackedMatrix& operator=(BitPackedMatrix&&) = default;
+
+    std::size_t
+    nsites() const
+    {
+        return nsites_;
+    }
+
+    std::size_t
+    nsam() const
+    {
+        return nsam_;
+    }
+
+    // Number of words holding sample data in each row
+    std::size_t
+    nwords() const
+    {
+        return nwords_;
+    }
+
+    // Number of words per row, including padding
+    std::size_t
+    stride() const
+    {
+        return stride_;
+    }
+
+    std::uint64_t*
+    data()
+    {
+        return words_.get();
+    }
+
+    const std::uint64_t*
+    data() const
+    {
+        return words_.get();
+    }
+
+    std::uint64_t*
+    row(std::size_t site)
+    {
+        return words_.get() + site * stride_;
+    }
+
+    const std::uint64_t*
+    row(std::size_t site) const
+    {
+        return words_.get() + site * stride_;
+    }
+
+    bool
+    get(std::size_t site, std::size_t sample) const
+    {
+        return (row(site)[sample >> 6] >> (sample & 63)) & 1;
+    }
+
+    void
+    set(std::size_t site, std::size_t sample, bool value)
+    {
+        const std::uint64_t bit = std::uint64_t(1) << (sample & 63);
+        std::uint64_t& w = row(site)[sample >> 6];
+        w = value ? (w | bit) : (w & ~bit);
+    }
+};
+
+// In-place transpose of a 64x64 bit matrix, where bit
+// j of a[i] is element (i, j).  Off-diagonal blocks are
+// swapped recursively, halving the block size each pass
+// (Warren, Hacker's Delight, section 7-3).
+inline void
+transpose64(std::uint64_t* a)
+{
+    std::uint64_t mask = 0x00000000ffffffffULL;
+    for (unsigned j = 32; j != 0; j >>= 1, mask ^= (mask << j))
+        {
+            for (unsigned k = 0; k < 64; k = ((k | j) + 1) & ~j)
+                {
+                    const std::uint64_t t
+                        = ((a[k] >> j) ^ a[k | j]) & mask;
+                    a[k] ^= t << j;
+                    a[k | j] ^= t;
+                }
+        }
+}
+
+// Sample-major copy of a variant-major matrix.  Row i
+// of the return value holds the states of sample i at
+// every site.  The copy is made one 64x64 tile at a
+// time, so each tile is read and written sequentially.
+inline BitPackedMatrix
+transpose(const BitPackedMatrix& m)
+{
+    BitPackedMatrix rv(m.nsam(), m.nsites());
+    std::uint64_t tile[64];
+    for (std::size_t site0 = 0; site0 < m.nsites(); site0 += 64)
+        {
+            const std::size_t nrows = std::min<std::size_t>(
+                64, m.nsites() - site0);
+            for (std::size_t w = 0; w < m.nwords(); ++w)
+                {
+                    for (std::size_t i = 0; i < nrows; ++i)
+                        {
+                            tile[i] = m.row(site0 + i)[w];
+                        }
+                    std::fill(tile + nrows, tile + 64, 0);
+                    transpose64(tile);
+                    const std::size_t ncols = std::min<std::size_t>(
+                        64, m.nsam() - 64 * w);
+                    for (std::size_t i = 0; i < ncols; ++i)
+                        {
+                            rv.row(64 * w + i)[site0 / 64] = tile[i];
+                        }
+                }
+        }
+    return rv;
+}
+
+#endif
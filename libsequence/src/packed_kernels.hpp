@@ -0,0 +1,53 @@
+#ifndef PYLIBSEQ_PACKED_KERNELS_HPP__
+#define PYLIBSEQ_PACKED_KERNELS_HPP__
+
+#include <cstddef>
+#include <cstdint>
+#include "popcount.hpp"
+
+// Per-site popcount kernels specialized on the number
+// of words per row.  For the small sample sizes typical
+// of simulated replicates, the loop in count_site_packed
+// has a compile-time trip count and is fully unrolled.
+
+using site_counter_t = std::uint32_t (*)(const std::uint64_t*, std::size_t);
+
+template <std::size_t NW>
+inline std::uint32_t
+count_site_packed(const std::uint64_t* row, std::size_t)
+{
+    std::uint64_t rv = 0;
+    for (std::size_t i = 0; i < NW; ++i)
+        {
+            rv += popcount::word(row[i]);
+        }
+    return static_cast<std::uint32_t>(rv);
+}
+
+inline std::uint32_t
+count_site_generic(const std::uint64_t* row, std::size_t nwords)
+{
+    return static_cast<std::uint32_t>(popcount::count(row, nwords));
+}
+
+inline site_counter_t
+select_site_counter(std::size_t nwords)
+{
+    switch (nwords)
+        {
+        case 1:
+            return count_site_packed<1>;
+        case 2:
+            return count_site_packed<2>;
+        case 4:
+            return count_site_packed<4>;
+        case 8:
+            return count_site_packed<8>;
+        case 16:
+            return count_site_packed<16>;
+        default:
+            return count_site_generic;
+        }
+}
+
+#endif
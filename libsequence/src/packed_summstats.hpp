@@ -0,0 +1,165 @@
+#ifndef PYLIBSEQ_PACKED_SUMMSTATS_HPP__
+#define PYLIBSEQ_PACKED_SUMMSTATS_HPP__
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <functional>
+#include <stdexcept>
+#include <unordered_map>
+#include <vector>
+#include "bitpacked_matrix.hpp"
+#include "packed_kernels.hpp"
+
+// Summary statistics calculated directly from
+// bit-packed 0/1 data.  0 is the ancestral state.
+
+struct PackedSummary
+{
+    std::uint32_t S;           // Number of polymorphic sites
+    std::uint32_t singletons;  // Sites where the minor allele count is 1
+    std::uint32_t dsingletons; // Sites where the derived allele count is 1
+    PackedSummary() : S(0), singletons(0), dsingletons(0) {}
+};
+
+inline std::vector<std::uint32_t>
+derived_allele_counts(const BitPackedMatrix& m)
+{
+    const site_counter_t counter = select_site_counter(m.nwords());
+    std::vector<std::uint32_t> rv(m.nsites());
+    for (std::size_t site = 0; site < m.nsites(); ++site)
+        {
+            rv[site] = counter(m.row(site), m.nwords());
+        }
+    return rv;
+}
+
+inline PackedSummary
+summarize_packed(const BitPackedMatrix& m)
+{
+    // The counts are accumulated from comparisons rather
+    // than branches, as the allele counts at successive
+    // sites are not predictable.
+    PackedSummary rv;
+    const std::uint32_t n = static_cast<std::uint32_t>(m.nsam());
+    const site_counter_t counter = select_site_counter(m.nwords());
+    for (std::size_t site = 0; site < m.nsites(); ++site)
+        {
+            const std::uint32_t c = counter(m.row(site), m.nwords());
+            const std::uint32_t polymorphic = (c > 0) & (c < n);
+            rv.S += polymorphic;
+            rv.singletons += polymorphic & ((c == 1) | (c + 1 == n));
+            rv.dsingletons += polymorphic & (c == 1);
+        }
+    return rv;
+}
+
+// Mean number of pairwise differences.  A site where
+// c of n samples carry the derived allele contributes
+// c(n - c) differences, so no pairs need be compared.
+inline double
+thetapi_packed(const BitPackedMatrix& m)
+{
+    const std::size_t n = m.nsam();
+    if (n < 2)
+        {
+            return 0.0;
+        }
+    const site_counter_t counter = select_site_counter(m.nwords());
+    std::uint64_t ndiffs = 0;
+    for (std::size_t site = 0; site < m.nsites(); ++site)
+        {
+            const std::uint64_t c = counter(m.row(site), m.nwords());
+            ndiffs += c * (n - c);
+        }
+    return static_cast<double>(ndiffs)
+           / (static_cast<double>(n) * static_cast<double>(n - 1) / 2.0);
+}
+
+// FNV-1a hash of each row of sample-major data
+inline std::vector<std::uint64_t>
+hash_haplotypes(const BitPackedMatrix& samples)
+{
+    std::vector<std::uint64_t> rv(samples.nsites());
+    for (std::size_t i = 0; i < samples.nsites(); ++i)
+        {
+            std::uint64_t h = 0xcbf29ce484222325ULL;
+            const std::uint64_t* r = samples.row(i);
+            for (std::size_t w = 0; w < samples.nwords(); ++w)
+                {
+                    for (unsigned byte = 0; byte < 64; byte += 8)
+                        {
+                            h ^= (r[w] >> byte) & 0xff;
+                            h *= 0x100000001b3ULL;
+                        }
+                }
+            rv[i] = h;
+        }
+    return rv;
+}
+
+// Number of occurrences of each distinct haplotype
+// in sample-major data.  Haplotypes are grouped by
+// hash and then compared, so collisions are harmless.
+inline std::vector<std::uint32_t>
+haplotype_counts(const BitPackedMatrix& samples)
+{
+    const auto hashes = hash_haplotypes(samples);
+    const std::size_t nbytes = samples.nwords() * sizeof(std::uint64_t);
+    std::unordered_map<std::uint64_t, std::vector<std::size_t>> buckets;
+    std::vector<std::size_t> representatives;
+    std::vector<std::uint32_t> counts;
+    for (std::size_t i = 0; i < samples.nsites(); ++i)
+        {
+            auto& bucket = buckets[hashes[i]];
+            bool found = false;
+            for (auto label : bucket)
+                {
+                    if (std::memcmp(samples.row(representatives[label]),
+                                    samples.row(i), nbytes)
+                        == 0)
+                        {
+                            ++counts[label];
+                            found = true;
+                            break;
+                        }
+                }
+            if (!found)
+                {
+                    bucket.push_back(counts.size());
+                    representatives.push_back(i);
+                    counts.push_back(1);
+                }
+        }
+    return counts;
+}
+
+struct PackedGarudStats
+{
+    double H1, H12, H2H1;
+};
+
+// H1, H12, and H2/H1 from Garud et al. (PMC4338236)
+inline PackedGarudStats
+garud_packed(const BitPackedMatrix& samples)
+{
+    if (samples.nsites() == 0)
+        {
+            throw std::invalid_argument("sample size must be > 0");
+        }
+    auto counts = haplotype_counts(samples);
+    std::sort(counts.begin(), counts.end(),
+              std::greater<std::uint32_t>());
+    const double n = static_cast<double>(samples.nsites());
+    double H1 = 0.0;
+    for (auto c : counts)
+        {
+            H1 += (c / n) * (c / n);
+        }
+    const double p1 = counts[0] / n;
+    const double p2 = counts.size() > 1 ? counts[1] / n : 0.0;
+    const double H12 = H1 + 2.0 * p1 * p2;
+    return PackedGarudStats{ H1, H12, (H1 - p1 * p1) / H1 };
+}
+
+#endif
@@ -0,0 +1,238 @@
+#ifndef PYLIBSEQ_POPCOUNT_HPP__
+#define PYLIBSEQ_POPCOUNT_HPP__
+
+#include <cstddef>
+#include <cstdint>
+#include "popcount_swar.hpp"
+
+// Population counts over arrays of 64-bit words.
+// On x86 with GCC/clang, the kernel is selected once,
+// at run time:
+// 1. AVX-512 VPOPCNTDQ, for arrays of at least
+//    avx512_min_words words, falling back to 2.
+//    for shorter arrays (GCC >= 7 and clang >= 8 only)
+// 2. AVX2 Harley-Seal (Mula, Kurz, and Lemire,
+//    doi:10.1093/comjnl/bxx046)
+// 3. SWAR (see popcount_swar.hpp)
+// Elsewhere, __builtin_popcountll is used, as it maps to
+// a hardware instruction on other common architectures.
+
+#if defined(__x86_64__) && (defined(__GNUC__) || defined(__clang__))
+#define PYLIBSEQ_X86_DISPATCH 1
+#include <immintrin.h>
+// VPOPCNTDQ intrinsics, and detecting the instructions at
+// run time, need GCC 7 or clang 8 (Apple clang 11).  Older
+// compilers use the AVX2 and SWAR kernels only.
+#if defined(__clang__)
+#if (defined(__apple_build_version__) && __clang_major__ >= 11)             \
+    || (!defined(__apple_build_version__) && __clang_major__ >= 8)
+#define PYLIBSEQ_AVX512_DISPATCH 1
+#endif
+#elif __GNUC__ >= 7
+#define PYLIBSEQ_AVX512_DISPATCH 1
+#endif
+#endif
+
+namespace popcount
+{
+    using kernel_t = std::uint64_t (*)(const std::uint64_t*, std::size_t);
+
+#if defined(__GNUC__) || defined(__clang__)
+    inline std::uint64_t
+    popcount_scalar(const std::uint64_t* words, std::size_t n)
+    {
+        std::uint64_t rv = 0;
+        for (std::size_t i = 0; i < n; ++i)
+            {
+                rv += static_cast<std::uint64_t>(
+                    __builtin_popcountll(words[i]));
+            }
+        return rv;
+    }
+#endif
+
+#ifdef PYLIBSEQ_X86_DISPATCH
+    namespace detail
+    {
+        __attribute__((target("avx2"))) inline __m256i
+        popcount256(__m256i v)
+        {
+            const __m256i lookup = _mm256_setr_epi8(
+                0, 1, 1, 2, 1, 2, 2, 3, 1, 2, 2, 3, 2, 3, 3, 4, 0, 1, 1, 2, 1,
+                2, 2, 3, 1, 2, 2, 3, 2, 3, 3, 4);
+            const __m256i low_mask = _mm256_set1_epi8(0x0f);
+            const __m256i lo = _mm256_and_si256(v, low_mask);
+            const __m256i hi
+                = _mm256_and_si256(_mm256_srli_epi32(v, 4), low_mask);
+            const __m256i counts
+                = _mm256_add_epi8(_mm256_shuffle_epi8(lookup, lo),
+                                  _mm256_shuffle_epi8(lookup, hi));
+            return _mm256_sad_epu8(counts, _mm256_setzero_si256());
+        }
+
+        // Carry-save adder
+        __attribute__((target("avx2"))) inline void
+        csa(__m256i* h, __m256i* l, __m256i a, __m256i b, __m256i c)
+        {
+            const __m256i u = _mm256_xor_si256(a, b);
+            *h = _mm256_or_si256(_mm256_and_si256(a, b),
+                                 _mm256_and_si256(u, c));
+            *l = _mm256_xor_si256(u, c);
+        }
+
+        __attribute__((target("avx2"))) inline __m256i
+        load(const std::uint64_t* p)
+        {
+            return _mm256_loadu_si256(reinterpret_cast<const __m256i*>(p));
+        }
+
+        __attribute__((target("avx2"))) inline std::uint64_t
+        hsum(__m256i v)
+        {
+            return static_cast<std::uint64_t>(_mm256_extract_epi64(v, 0))
+                   + static_cast<std::uint64_t>(_mm256_extract_epi64(v, 1))
+                   + static_cast<std::uint64_t>(_mm256_extract_epi64(v, 2))
+                   + static_cast<std::uint64_t>(_mm256_extract_epi64(v, 3));
+        }
+    } // namespace detail
+
+    __attribute__((target("avx2"))) inline std::uint64_t
+    popcount_avx2(const std::uint64_t* words, std::size_t n)
+    {
+        using detail::csa;
+        using detail::load;
+        using detail::popcount256;
+        const std::size_t nvec = n / 4;
+        const std::size_t limit = nvec - nvec % 16;
+        __m256i total = _mm256_setzero_si256();
+        __m256i ones = _mm256_setzero_si256();
+        __m256i twos = _mm256_setzero_si256();
+        __m256i fours = _mm256_setzero_si256();
+        __m256i eights = _mm256_setzero_si256();
+        __m256i sixteens, twosA, twosB, foursA, foursB, eightsA, eightsB;
+        std::size_t i = 0;
+        for (; i < limit; i += 16)
+            {
+                const std::uint64_t* p = words + 4 * i;
+                csa(&twosA, &ones, ones, load(p), load(p + 4));
+                csa(&twosB, &ones, ones, load(p + 8), load(p + 12));
+                csa(&foursA, &twos, twos, twosA, twosB);
+                csa(&twosA, &ones, ones, load(p + 16), load(p + 20));
+                csa(&twosB, &ones, ones, load(p + 24), load(p + 28));
+                csa(&foursB, &twos, twos, twosA, twosB);
+                csa(&eightsA, &fours, fours, foursA, foursB);
+                csa(&twosA, &ones, ones, load(p + 32), load(p + 36));
+                csa(&twosB, &ones, ones, load(p + 40), load(p + 44));
+                csa(&foursA, &twos, twos, twosA, twosB);
+                csa(&twosA, &ones, ones, load(p + 48), load(p + 52));
+                csa(&twosB, &ones, ones, load(p + 56), load(p + 60));
+                csa(&foursB, &twos, twos, twosA, twosB);
+                csa(&eightsB, &fours, fours, foursA, foursB);
+                csa(&sixteens, &eights, eights, eightsA, eightsB);
+                total = _mm256_add_epi64(total, popcount256(sixteens));
+            }
+        total = _mm256_slli_epi64(total, 4);
+        total = _mm256_add_epi64(
+            total, _mm256_slli_epi64(popcount256(eights), 3));
+        total = _mm256_add_epi64(total,
+                                 _mm256_slli_epi64(popcount256(fours), 2));
+        total = _mm256_add_epi64(total,
+                                 _mm256_slli_epi64(popcount256(twos), 1));
+        total = _mm256_add_epi64(total, popcount256(ones));
+        for (; i < nvec; ++i)
+            {
+                total = _mm256_add_epi64(total,
+                                         popcount256(load(words + 4 * i)));
+            }
+        return detail::hsum(total)
+               + popcount_swar(words + 4 * nvec, n - 4 * nvec);
+    }
+
+#ifdef PYLIBSEQ_AVX512_DISPATCH
+    // Short arrays stay on the AVX2 path, as they gain little
+    // from 512-bit instructions, and using those may lower the
+    // clock speed of the core.
+    constexpr std::size_t avx512_min_words = 16;
+
+    namespace detail
+    {
+        // Written out, rather than using _mm512_reduce_add_epi64,
+        // whose GCC implementation triggers -Wuninitialized.
+        __attribute__((target("avx512f"))) inline std::uint64_t
+        hsum512(__m512i v)
+        {
+            std::uint64_t lanes[8];
+            _mm512_storeu_si512(lanes, v);
+            return lanes[0] + lanes[1] + lanes[2] + lanes[3] + lanes[4]
+                   + lanes[5] + lanes[6] + lanes[7];
+        }
+    } // namespace detail
+
+    __attribute__((target("avx512f,avx512vpopcntdq"))) inline std::uint64_t
+    popcount_avx512(const std::uint64_t* words, std::size_t n)
+    {
+        __m512i total = _mm512_setzero_si512();
+        std::size_t i = 0;
+        for (; i + 8 <= n; i += 8)
+            {
+                total = _mm512_add_epi64(
+                    total, _mm512_popcnt_epi64(_mm512_loadu_si512(words + i)));
+            }
+        return detail::hsum512(total) + popcount_swar(words + i, n - i);
+    }
+
+    inline std::uint64_t
+    popcount_avx512_or_avx2(const std::uint64_t* words, std::size_t n)
+    {
+        return n >= avx512_min_words ? popcount_avx512(words, n)
+                                     : popcount_avx2(words, n);
+    }
+#endif
+#endif
+
+    // Number of set bits in a single word
+    inline std::uint64_t
+    word(std::uint64_t x)
+    {
+#if defined(__POPCNT__)                                                      \
+    || ((defined(__GNUC__) || defined(__clang__))                            \
+        && !defined(PYLIBSEQ_X86_DISPATCH))
+        return static_cast<std::uint64_t>(__builtin_popcountll(x));
+#else
+        return swar64(x);
+#endif
+    }
+
+    inline kernel_t
+    select_kernel()
+    {
+#ifdef PYLIBSEQ_X86_DISPATCH
+        __builtin_cpu_init();
+#ifdef PYLIBSEQ_AVX512_DISPATCH
+        if (__builtin_cpu_supports("avx512vpopcntdq"))
+            {
+                return popcount_avx512_or_avx2;
+            }
+#endif
+        if (__builtin_cpu_supports("avx2"))
+            {
+                return popcount_avx2;
+            }
+        return popcount_swar;
+#elif defined(__GNUC__) || defined(__clang__)
+        return popcount_scalar;
+#else
+        return popcount_swar;
+#endif
+    }
+
+    // Number of set bits in words[0, n)
+    inline std::uint64_t
+    count(const std::uint64_t* words, std::size_t n)
+    {
+        static const kernel_t kernel = select_kernel();
+        return kernel(words, n);
+    }
+} // namespace popcount
+
+#endif
@@ -0,0 +1,75 @@
+#ifndef PYLIBSEQ_POPCOUNT_SWAR_HPP__
+#define PYLIBSEQ_POPCOUNT_SWAR_HPP__
+
+#include <cstddef>
+#include <cstdint>
+
+// Portable popcounts that use only 64-bit integer
+// arithmetic (Warren, Hacker's Delight, section 5-1).
+// Unless compiled with -mpopcnt, __builtin_popcountll
+// on x86 is a call into libgcc, so these are the
+// fallback when AVX2 is not available.
+
+namespace popcount
+{
+    inline std::uint64_t
+    swar64(std::uint64_t x)
+    {
+        const std::uint64_t m1 = 0x5555555555555555ULL;
+        const std::uint64_t m2 = 0x3333333333333333ULL;
+        const std::uint64_t m4 = 0x0f0f0f0f0f0f0f0fULL;
+        const std::uint64_t h01 = 0x0101010101010101ULL;
+        x -= (x >> 1) & m1;
+        x = (x & m2) + ((x >> 2) & m2);
+        x = (x + (x >> 4)) & m4;
+        return (x * h01) >> 56;
+    }
+
+    // Carry-save adder
+    inline void
+    csa(std::uint64_t& h, std::uint64_t& l, std::uint64_t a, std::uint64_t b,
+        std::uint64_t c)
+    {
+        const std::uint64_t u = a ^ b;
+        h = (a & b) | (u & c);
+        l = u ^ c;
+    }
+
+    // Harley-Seal over blocks of eight words, with
+    // four independent accumulators for the remainder.
+    inline std::uint64_t
+    popcount_swar(const std::uint64_t* words, std::size_t n)
+    {
+        std::uint64_t total = 0, ones = 0, twos = 0, fours = 0;
+        std::uint64_t twosA, twosB, foursA, foursB, eights;
+        std::size_t i = 0;
+        for (; i + 8 <= n; i += 8)
+            {
+                csa(twosA, ones, ones, words[i], words[i + 1]);
+                csa(twosB, ones, ones, words[i + 2], words[i + 3]);
+                csa(foursA, twos, twos, twosA, twosB);
+                csa(twosA, ones, ones, words[i + 4], words[i + 5]);
+                csa(twosB, ones, ones, words[i + 6], words[i + 7]);
+                csa(foursB, twos, twos, twosA, twosB);
+                csa(eights, fours, fours, foursA, foursB);
+                total += swar64(eights);
+            }
+        total = 8 * total + 4 * swar64(fours) + 2 * swar64(twos)
+                + swar64(ones);
+        std::uint64_t acc[4] = { 0, 0, 0, 0 };
+        for (; i + 4 <= n; i += 4)
+            {
+                acc[0] += swar64(words[i]);
+                acc[1] += swar64(words[i + 1]);
+                acc[2] += swar64(words[i + 2]);
+                acc[3] += swar64(words[i + 3]);
+            }
+        for (; i < n; ++i)
+            {
+                acc[0] += swar64(words[i]);
+            }
+        return total + acc[0] + acc[1] + acc[2] + acc[3];
+    }
+} // namespace popcount
+
+#endif
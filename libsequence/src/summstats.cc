@@ -7,6 +7,7 @@
 #include <Sequence/AlleleCountMatrix.hpp>
 #include <Sequence/summstats.hpp>
 #include <Sequence/summstats/ld.hpp>
+#include "packed_summstats.hpp"
 
 //The following headers are
 //from the deprecated libsequence API
@@ -174,7 +175,23 @@ init_summstats(py::module& m)
         .def_readonly("H1", &Sequence::GarudStats::H1, "Value of H1")
         .def_readonly("H12", &Sequence::GarudStats::H12, "Value of H2")
         .def_readonly("H2H1", &Sequence::GarudStats::H2H1, "Value of H2/H1");
-    m.def("garud_statistics", &Sequence::garud_statistics);
+    m.def("garud_statistics", [](const Sequence::VariantMatrix& m) {
+        // 0/1 data are handled by hashing bit-packed haplotypes
+        try
+            {
+                const auto g = garud_packed(transpose(BitPackedMatrix(m)));
+                Sequence::GarudStats rv;
+                rv.H1 = g.H1;
+                rv.H12 = g.H12;
+                rv.H2H1 = g.H2H1;
+                return rv;
+            }
+        catch (const std::invalid_argument&)
+            {
+                // Other encodings, or no samples
+            }
+        return Sequence::garud_statistics(m);
+    });
     m.def("two_locus_haplotype_counts", &Sequence::two_locus_haplotype_counts);
 
     py::class_<Sequence::AlleleCounts>(m, "AlleleCounts")
@@ -199,6 +216,76 @@ init_summstats(py::module& m)
               return Sequence::non_reference_allele_counts(m, refstates);
           });
 
+    py::class_<PackedSummary>(m, "PackedSummary",
+                              "Site counts obtained from bit-packed data.")
+        .def_readonly("S", &PackedSummary::S,
+                      "Number of polymorphic sites")
+        .def_readonly("singletons", &PackedSummary::singletons,
+                      "Number of sites where the minor allele count is 1")
+        .def_readonly("dsingletons", &PackedSummary::dsingletons,
+                      "Number of sites where the derived (1) allele "
+                      "count is 1");
+
+    m.def(
+        "packed_summary",
+        [](const Sequence::VariantMatrix& m) {
+            return summarize_packed(BitPackedMatrix(m));
+        },
+        R"delim(
+            Number of polymorphic sites, singletons, and derived
+            singletons calculated in a single pass over bit-packed
+            data.
+
+            :param m: A :class:`libsequence.VariantMatrix`
+            :rtype: :class:`libsequence.PackedSummary`
+
+            .. note::
+
+                The data must be encoded as 0/1.
+
+            .. versionadded:: 0.2.3
+            )delim",
+        py::arg("m"));
+
+    m.def(
+        "derived_allele_counts",
+        [](const Sequence::VariantMatrix& m) {
+            return derived_allele_counts(BitPackedMatrix(m));
+        },
+        R"delim(
+            Number of 1 states at each site, calculated
+            from bit-packed data.
+
+            :param m: A :class:`libsequence.VariantMatrix`
+            :rtype: list
+
+            .. note::
+
+                The data must be encoded as 0/1.
+
+            .. versionadded:: 0.2.3
+            )delim",
+        py::arg("m"));
+
+    m.def(
+        "packed_thetapi",
+        [](const Sequence::VariantMatrix& m) {
+            return thetapi_packed(BitPackedMatrix(m));
+        },
+        R"delim(
+            Mean number of pairwise differences, calculated
+            from the derived allele counts of bit-packed sites.
+
+            :param m: A :class:`libsequence.VariantMatrix`
+
+            .. note::
+
+                The data must be encoded as 0/1.
+
+            .. versionadded:: 0.2.3
+            )delim",
+        py::arg("m"));
+
     //py::object polytable
     //    = (py::object)py::module::import("libsequence.polytable")
     //          .attr("PolyTable");
@@ -308,13 +395,16 @@ init_summstats(py::module& m)
                 {
                     gm = gmap.cast<std::unordered_map<double, double>>();
                 }
+            // One allocation for the results, rather than
+            // regrowing the vector as core SNPs are processed.
+            rv.reserve(cores.size());
             for (auto c : cores)
                 {
                     auto nsl = Sequence::nSL(c, d, gm);
+                    const auto& site = (d.sbegin() + c)->second;
                     auto dc = static_cast<std::uint32_t>(
-                        std::count((d.sbegin() + c)->second.begin(),
-                                   (d.sbegin() + c)->second.end(), '1'));
-                    rv.push_back(std::make_tuple(nsl.first, nsl.second, dc));
+                        std::count(site.begin(), site.end(), '1'));
+                    rv.emplace_back(nsl.first, nsl.second, dc);
                 }
             return rv;
         },
@@ -11,6 +11,8 @@
 #include <Sequence/variant_matrix/windows.hpp>
 #include <Sequence/variant_matrix/msformat.hpp>
 #include <Sequence/StateCounts.hpp>
+#include "bitpacked_matrix.hpp"
+#include "packed_summstats.hpp"
 
 namespace py = pybind11;
 
@@ -20,11 +22,33 @@ class NumpyGenotypeCapsule : public Sequence::GenotypeCapsule
     py::array_t<std::int8_t> buffer;
     std::size_t nsites_, nsam_;
 
+    static py::array_t<std::int8_t>
+    validate(py::array_t<std::int8_t> input)
+    {
+        if (input.ndim() != 2)
+            {
+                throw std::invalid_argument(
+                    "genotypes must be a two-dimensional array");
+            }
+        if (!input.writeable())
+            {
+                // The matrix may be modified, or exported
+                // via the buffer protocol, so read-only
+                // input (e.g., VariantMatrix.data) is copied.
+                return py::array_t<std::int8_t>(
+                    std::vector<std::size_t>{
+                        static_cast<std::size_t>(input.shape(0)),
+                        static_cast<std::size_t>(input.shape(1)) },
+                    input.data());
+            }
+        return input;
+    }
+
   public:
     explicit NumpyGenotypeCapsule(
         py::array_t<std::int8_t, py::array::c_style | py::array::forcecast>
             input)
-        : buffer(std::move(input)), nsites_(buffer.shape(0)),
+        : buffer(validate(std::move(input))), nsites_(buffer.shape(0)),
           nsam_(buffer.shape(1))
     {
     }
@@ -290,6 +314,107 @@ class MockVM
     }
 };
 
+py::array_t<std::uint64_t>
+packed_as_numpy(BitPackedMatrix packed)
+{
+    // The array takes ownership of the packed buffer,
+    // so that no copy is made here.
+    std::unique_ptr<BitPackedMatrix> owner(
+        new BitPackedMatrix(std::move(packed)));
+    py::capsule free_when_done(owner.get(), [](void *p) {
+        delete reinterpret_cast<BitPackedMatrix *>(p);
+    });
+    BitPackedMatrix *p = owner.release();
+    auto rv = py::array_t<std::uint64_t>(
+        { p->nsites(), p->stride() },
+        { p->stride() * sizeof(std::uint64_t), sizeof(std::uint64_t) },
+        p->data(), free_when_done);
+    rv.attr("flags").attr("writeable") = false;
+    return rv;
+}
+
+// Store n 0/1 values as a stream of (n + 7) / 8 bytes,
+// where value k is bit k % 8 of byte k / 8.  Returns
+// false if any value is neither 0 nor 1.
+bool
+pack_bitstream(const std::int8_t *src, std::size_t n, std::string &bits)
+{
+    std::vector<std::uint64_t> words((n + 63) / 64);
+    if (pack_row(src, n, words.data()) != 0)
+        {
+            return false;
+        }
+    bits.resize((n + 7) / 8);
+    for (std::size_t i = 0; i < bits.size(); ++i)
+        {
+            bits[i] = static_cast<char>((words[i >> 3] >> (8 * (i & 7)))
+                                        & 0xff);
+        }
+    return true;
+}
+
+std::vector<std::int8_t>
+unpack_bitstream(const std::string &bits, std::size_t n)
+{
+    std::vector<std::int8_t> rv(n);
+    for (std::size_t i = 0; i < n; ++i)
+        {
+            rv[i] = static_cast<std::int8_t>(
+                (static_cast<unsigned char>(bits[i >> 3]) >> (i & 7)) & 1);
+        }
+    return rv;
+}
+
+template <typename RemoveIf>
+auto
+filter_sites_by_count(Sequence::VariantMatrix &m, const RemoveIf &remove_if)
+    -> decltype(Sequence::filter_sites(
+        m, std::function<bool(const Sequence::RowView &)>()))
+{
+    // Decide which sites to remove from the popcount of
+    // each packed site, so that no Python callbacks happen.
+    const auto counts = derived_allele_counts(BitPackedMatrix(m));
+    std::vector<char> remove(counts.size());
+    for (std::size_t i = 0; i < counts.size(); ++i)
+        {
+            remove[i] = remove_if(counts[i]);
+        }
+    // The site is found from the position of the view
+    // in the matrix, rather than from the order in which
+    // libsequence happens to call the predicate.
+    const std::int8_t *begin = m.cdata();
+    const std::size_t nsam = m.nsam();
+    // Without samples, rows are empty and every count is zero
+    const bool remove_empty = remove_if(0);
+    auto remove_site = [&remove, begin, nsam,
+                        remove_empty](const std::int8_t *row) {
+        if (nsam == 0)
+            {
+                return remove_empty;
+            }
+        if (row < begin
+            || static_cast<std::size_t>(row - begin) / nsam >= remove.size())
+            {
+                throw std::runtime_error(
+                    "row view does not belong to the VariantMatrix");
+            }
+        return remove[static_cast<std::size_t>(row - begin) / nsam] != 0;
+    };
+    if (m.resizable())
+        {
+            std::function<bool(const Sequence::RowView &)> f
+                = [&remove_site](const Sequence::RowView &r) {
+                      return remove_site(r.size() ? &r[0] : nullptr);
+                  };
+            return Sequence::filter_sites(m, f);
+        }
+    std::function<bool(const Sequence::ConstRowView &)> f
+        = [&remove_site](const Sequence::ConstRowView &r) {
+              return remove_site(r.size() ? &r[0] : nullptr);
+          };
+    return Sequence::filter_sites(m, f);
+}
+
 Sequence::VariantMatrix
 mslike_from_numpy(
     py::array_t<std::int8_t, py::array::c_style | py::array::forcecast>
@@ -453,10 +578,13 @@ init_VariantMatrix(py::module &m)
         });
 
     py::class_<Sequence::VariantMatrix>(m, "VariantMatrix",
-                                        //py::buffer_protocol(),
+                                        py::buffer_protocol(),
                                         R"delim(
         Representation of variation data in matrix format.
 
+        This object supports the buffer protocol, allowing
+        numpy arrays to share its memory.
+
         see :ref:`variantmatrix` for discussion.
         )delim")
         .def(py::init<const std::vector<std::int8_t> &,
@@ -540,13 +668,55 @@ init_VariantMatrix(py::module &m)
             "positions",
             [](const Sequence::VariantMatrix &self)
                 -> pybind11::array_t<double> {
+                // The VariantMatrix is the base object,
+                // keeping the memory alive for the array.
                 auto rv = pybind11::array_t<double>(
                     { self.nsites() }, { sizeof(double) }, self.pbegin(),
-                    pybind11::cast(self.pbegin()));
+                    pybind11::cast(self));
                 rv.attr("flags").attr("writeable") = false;
                 return rv;
             },
-            "Return positions as numpy array")
+            "Return positions as numpy array. No copy is made.")
+        .def_property_readonly(
+            "packed",
+            [](const Sequence::VariantMatrix &self) {
+                return packed_as_numpy(BitPackedMatrix(self));
+            },
+            R"delim(
+            Return the data as a bit-packed numpy array.
+
+            The array has dtype numpy.uint64 and shape
+            (nsites, stride).  Sample j of site i is bit
+            j % 64 of word j // 64 of row i.  Each row is padded
+            with zeros to a multiple of 32 bytes.
+
+            The packed array is generated each time this
+            property is accessed.
+
+            :raises ValueError: if the data are not 0/1 encoded.
+
+            .. versionadded:: 0.2.3
+            )delim")
+        .def_property_readonly(
+            "packed_samples",
+            [](const Sequence::VariantMatrix &self) {
+                return packed_as_numpy(transpose(BitPackedMatrix(self)));
+            },
+            R"delim(
+            Return the data as a sample-major bit-packed numpy array.
+
+            The array has dtype numpy.uint64 and shape
+            (nsam, stride).  Site i of sample j is bit i % 64 of
+            word i // 64 of row j, so that the states of a sample
+            are contiguous in memory.
+
+            The packed array is generated each time this
+            property is accessed.
+
+            :raises ValueError: if the data are not 0/1 encoded.
+
+            .. versionadded:: 0.2.3
+            )delim")
         .def_property_readonly(
             "nsites",
             [](const Sequence::VariantMatrix &self) { return self.nsites(); },
@@ -557,6 +727,35 @@ init_VariantMatrix(py::module &m)
             "Number of samples")
         .def_readonly_static("mask", &Sequence::VariantMatrix::mask,
                              "Reserved missing data state")
+        .def(
+            "write_allele",
+            [](Sequence::VariantMatrix &self, const std::size_t site,
+               const std::size_t sample, const std::int8_t value) {
+                if (value != 0 && value != 1)
+                    {
+                        throw std::invalid_argument(
+                            "allele value must be 0 or 1");
+                    }
+                self.at(site, sample) = value;
+            },
+            R"delim(
+            Set or clear the derived allele at a site.
+
+            :param site: Site index
+            :type site: int
+            :param sample: Sample index
+            :type sample: int
+            :param value: 0 or 1
+            :type value: int
+
+            .. note::
+
+                If the VariantMatrix was created from a numpy array,
+                the input array is modified.
+
+            .. versionadded:: 0.2.3
+            )delim",
+            py::arg("site"), py::arg("sample"), py::arg("value"))
         .def("count_alleles",
              [](const Sequence::VariantMatrix &m) {
                  return Sequence::AlleleCountMatrix(m);
@@ -587,18 +786,18 @@ init_VariantMatrix(py::module &m)
              :rtype: :class:`libsequence.variantmatrix.ConstColView`
              )delim",
             py::arg("i"))
-        //.def_buffer([](Sequence::VariantMatrix &m) -> py::buffer_info {
-        //    return py::buffer_info(
-        //        m.data(),            /* Pointer to buffer */
-        //        sizeof(std::int8_t), /* Size of one scalar */
-        //        py::format_descriptor<std::int8_t>::
-        //            format(), /* Python struct-style format descriptor */
-        //        2,            /* Number of dimensions */
-        //        { m.nsites(), m.nsam() }, /* Buffer dimensions */
-        //        { sizeof(std::int8_t)
-        //              * m.nsam(), /* Strides (in bytes) for each index */
-        //          sizeof(std::int8_t) });
-        //})
+        .def_buffer([](Sequence::VariantMatrix &m) -> py::buffer_info {
+            return py::buffer_info(
+                m.data(),            /* Pointer to buffer */
+                sizeof(std::int8_t), /* Size of one scalar */
+                py::format_descriptor<std::int8_t>::
+                    format(), /* Python struct-style format descriptor */
+                2,            /* Number of dimensions */
+                { m.nsites(), m.nsam() }, /* Buffer dimensions */
+                { sizeof(std::int8_t)
+                      * m.nsam(), /* Strides (in bytes) for each index */
+                  sizeof(std::int8_t) });
+        })
         .def(
             "window",
             [](const Sequence::VariantMatrix &m, const double beg,
@@ -615,18 +814,63 @@ init_VariantMatrix(py::module &m)
             py::arg("beg"), py::arg("end"), py::arg("i"), py::arg("j"))
         .def(py::pickle(
             [](const Sequence::VariantMatrix &m) {
-                std::vector<std::int8_t> temp(
-                    m.data(), m.data() + m.nsites() * m.nsam());
-                std::vector<double> ptemp(m.pbegin(), m.pend());
-                return py::make_tuple(std::move(temp), std::move(ptemp));
+                // 0/1 data are stored as a bitstream.
+                // Anything else is stored as raw int8 values.
+                py::bytes positions(
+                    reinterpret_cast<const char *>(m.pbegin()),
+                    m.nsites() * sizeof(double));
+                std::string bits;
+                if (pack_bitstream(m.cdata(), m.nsites() * m.nsam(), bits))
+                    {
+                        return py::make_tuple("packed", m.nsites(), m.nsam(),
+                                              py::bytes(bits), positions);
+                    }
+                return py::make_tuple(
+                    "int8", m.nsites(), m.nsam(),
+                    py::bytes(reinterpret_cast<const char *>(m.cdata()),
+                              m.nsites() * m.nsam()),
+                    positions);
             },
             [](py::tuple t) {
-                if (t.size() != 2)
+                if (t.size() == 2)
+                    {
+                        // State pickled by versions <= 0.2.2
+                        auto d = t[0].cast<std::vector<std::int8_t>>();
+                        auto p = t[1].cast<std::vector<double>>();
+                        return Sequence::VariantMatrix(std::move(d),
+                                                       std::move(p));
+                    }
+                if (t.size() != 5)
+                    {
+                        throw std::runtime_error("invalid object state");
+                    }
+                const auto format = t[0].cast<std::string>();
+                const auto nsites = t[1].cast<std::size_t>();
+                const auto nsam = t[2].cast<std::size_t>();
+                const auto data = t[3].cast<std::string>();
+                const auto pbytes = t[4].cast<std::string>();
+                if (pbytes.size() != nsites * sizeof(double))
                     {
                         throw std::runtime_error("invalid object state");
                     }
-                auto d = t[0].cast<std::vector<std::int8_t>>();
-                auto p = t[1].cast<std::vector<double>>();
+                std::vector<double> p(nsites);
+                std::memcpy(p.data(), pbytes.data(), pbytes.size());
+                if (format == "packed")
+                    {
+                        if (data.size() != (nsites * nsam + 7) / 8)
+                            {
+                                throw std::runtime_error(
+                                    "invalid object state");
+                            }
+                        return Sequence::VariantMatrix(
+                            unpack_bitstream(data, nsites * nsam),
+                            std::move(p));
+                    }
+                if (format != "int8" || data.size() != nsites * nsam)
+                    {
+                        throw std::runtime_error("invalid object state");
+                    }
+                std::vector<std::int8_t> d(data.begin(), data.end());
                 return Sequence::VariantMatrix(std::move(d), std::move(p));
             }));
 
@@ -682,8 +926,10 @@ init_VariantMatrix(py::module &m)
             "Return contents as a list.");
 
     py::class_<Sequence::ConstRowView>(m, "ConstRowView",
+                                       py::buffer_protocol(),
                                        R"delim(
-        Immutable view of a sample.
+        Immutable view of a site.  This object supports
+        the buffer protocol.
 
         See :ref:`variantmatrix`.
         )delim")
@@ -705,11 +951,29 @@ init_VariantMatrix(py::module &m)
                     }
                 return rv;
             },
-            "Return contents as a list.");
+            "Return contents as a list.")
+        .def_buffer([](const Sequence::ConstRowView &r) -> py::buffer_info {
+            return py::buffer_info(
+                //TODO: fix this const_cast hack
+                //once pybind11 supports read-only
+                //buffers!
+                const_cast<std::int8_t *>(
+                    r.size() ? &r[0] : nullptr), /* Pointer to buffer */
+                sizeof(std::int8_t),             /* Size of one scalar */
+                py::format_descriptor<std::int8_t>::
+                    format(), /* Python struct-style format descriptor */
+                1,            /* Number of dimensions */
+                { r.size() }, /* Buffer dimensions */
+                {
+                    sizeof(std::int8_t)
+                    /* Strides (in bytes) for each index */
+                });
+        });
 
-    py::class_<Sequence::RowView>(m, "RowView",
+    py::class_<Sequence::RowView>(m, "RowView", py::buffer_protocol(),
                                   R"delim(
-        View of a sample in a VariantMatrix.
+        View of a site in a VariantMatrix.  This object
+        supports the buffer protocol.
 
         See :ref:`variantmatrix`.
         )delim")
@@ -720,13 +984,27 @@ init_VariantMatrix(py::module &m)
                 return py::make_iterator(r.begin(), r.end());
             },
             py::keep_alive<0, 1>())
-        .def("as_list", [](const Sequence::RowView &r) {
-            py::list rv;
-            for (auto i : r)
+        .def("as_list",
+             [](const Sequence::RowView &r) {
+                 py::list rv;
+                 for (auto i : r)
+                     {
+                         rv.append(static_cast<int>(i));
+                     }
+                 return rv;
+             })
+        .def_buffer([](Sequence::RowView &r) -> py::buffer_info {
+            return py::buffer_info(
+                r.size() ? &r[0] : nullptr, /* Pointer to buffer */
+                sizeof(std::int8_t),        /* Size of one scalar */
+                py::format_descriptor<std::int8_t>::
+                    format(), /* Python struct-style format descriptor */
+                1,            /* Number of dimensions */
+                { r.size() }, /* Buffer dimensions */
                 {
-                    rv.append(static_cast<int>(i));
-                }
-            return rv;
+                    sizeof(std::int8_t)
+                    /* Strides (in bytes) for each index */
+                });
         });
 
     py::class_<Sequence::StateCounts>(m, "StateCounts", py::buffer_protocol(),
@@ -891,6 +1169,71 @@ init_VariantMatrix(py::module &m)
             )delim",
         py::arg("m"), py::arg("f"));
 
+    m.def(
+        "filter_sites",
+        [](Sequence::VariantMatrix &m, const std::string &kind) {
+            const std::uint32_t n = static_cast<std::uint32_t>(m.nsam());
+            if (kind == "singleton")
+                {
+                    return filter_sites_by_count(m, [n](std::uint32_t c) {
+                        return c == 1 || c + 1 == n;
+                    });
+                }
+            if (kind == "fixed")
+                {
+                    return filter_sites_by_count(m, [n](std::uint32_t c) {
+                        return c == 0 || c == n;
+                    });
+                }
+            if (kind == "polymorphic")
+                {
+                    return filter_sites_by_count(m, [n](std::uint32_t c) {
+                        return c > 0 && c < n;
+                    });
+                }
+            throw std::invalid_argument("unknown filter: " + kind);
+        },
+        R"delim(
+            Remove sites from a VariantMatrix without calling back
+            into Python.
+
+            :param m: A variant matrix
+            :type m: :class:`libsequence.variant_matrix.VariantMatrix`
+            :param kind: "singleton", "fixed", or "polymorphic"
+            :type kind: str
+
+            The data must be encoded as 0/1.  A site is removed if
+            its minor allele count is one ("singleton"), if it is
+            not variable ("fixed"), or if it is variable
+            ("polymorphic").
+
+            .. versionadded:: 0.2.3
+            )delim",
+        py::arg("m"), py::arg("kind"));
+
+    m.def(
+        "filter_sites",
+        [](Sequence::VariantMatrix &m, const std::uint32_t min_count) {
+            const std::uint32_t n = static_cast<std::uint32_t>(m.nsam());
+            return filter_sites_by_count(m, [n, min_count](std::uint32_t c) {
+                return std::min(c, n - c) < min_count;
+            });
+        },
+        R"delim(
+            Remove sites whose minor allele count is less
+            than min_count.
+
+            :param m: A variant matrix
+            :type m: :class:`libsequence.variant_matrix.VariantMatrix`
+            :param min_count: Minimum minor allele count
+            :type min_count: int
+
+            The data must be encoded as 0/1.
+
+            .. versionadded:: 0.2.3
+            )delim",
+        py::arg("m"), py::arg("min_count"));
+
     // Various I/O for VariantMatrix in "ms" format
     m.def("ms_from_stdin", []() -> py::object {
         if (std::cin.eof())
@@ -21,6 +21,15 @@ if '--gcc' in sys.argv:
 else:
     USE_GCC = False
 
+# Builds target the CPU doing the compiling.
+# For distributable builds (e.g., wheels), use
+# setup.py --portable, which targets Haswell (AVX2).
+if '--portable' in sys.argv:
+    PORTABLE = True
+    sys.argv.remove('--portable')
+else:
+    PORTABLE = False
+
 if '--no-weffcpp' in sys.argv:
     USE_WEFFCPP = False
     sys.argv.remove('--no-weffcpp')
@@ -70,6 +79,19 @@ class CMakeBuild(build_ext):
         else:
             cmake_args += ['-DCMAKE_BUILD_TYPE=' + cfg]
             build_args += ['--', '-j2']
+            release_flags = ['-O3', '-DNDEBUG', '-flto',
+                             '-fvisibility=hidden']
+            if platform.system() == "Linux":
+                release_flags.append('-fno-plt')
+            if platform.machine() == 'x86_64':
+                if PORTABLE is True:
+                    # The AVX2 baseline, spelled in a form that
+                    # compilers older than GCC 11/clang 12 accept
+                    release_flags += ['-march=haswell', '-mtune=generic']
+                else:
+                    release_flags.append('-march=native')
+            cmake_args.append(
+                '-DCMAKE_CXX_FLAGS_RELEASE=' + ' '.join(release_flags))
 
         env = os.environ.copy()
         env['CXXFLAGS'] = '{} -DVERSION_INFO=\\"{}\\"'.format(env.get('CXXFLAGS', ''),
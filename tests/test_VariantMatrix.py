@@ -4,13 +4,10 @@ import numpy as np
 
 
 def is_singleton(x):
-    from collections import Counter
-    c = Counter([i for i in x])
-    if len(c) == 2:
-        for i in c.most_common():
-            if i[1] == 1:
-                return True
-    return False
+    # Site views support the buffer protocol,
+    # so this sum happens in numpy.
+    s = int(np.asarray(x).sum())
+    return s == 1 or s == len(x) - 1
 
 
 class RemoveNonRefSingletons(object):
@@ -32,7 +29,11 @@ class testVariantMatrix(unittest.TestCase):
     def setUp(self):
         self.data = [0, 1, 1, 0, 0, 0, 0, 1]
         self.pos = [0.1, 0.2]
-        self.m = libsequence.VariantMatrix(self.data, self.pos)
+        # Constructing from numpy avoids converting
+        # each element of a list.
+        self.m = libsequence.VariantMatrix(
+            np.array(self.data, dtype=np.int8).reshape(2, 4),
+            np.array(self.pos))
 
     def testConstruct(self):
         self.assertTrue(np.array_equal(self.m.data, np.array(
@@ -41,10 +42,60 @@ class testVariantMatrix(unittest.TestCase):
         self.assertEqual(self.m.nsam, 4)
         self.assertEqual(self.m.nsites, 2)
 
+    def testPositionsView(self):
+        p = self.m.positions
+        self.assertTrue(p.flags.c_contiguous)
+        self.assertTrue(np.shares_memory(p, self.m.positions))
+        m = libsequence.VariantMatrix(self.data, self.pos)
+        p = m.positions
+        del m
+        self.assertTrue(np.array_equal(p, self.pos))
+
+    def testConstructFromList(self):
+        m = libsequence.VariantMatrix(self.data, self.pos)
+        self.assertTrue(np.array_equal(m.data, self.m.data))
+        self.assertTrue(np.array_equal(m.positions, self.m.positions))
+
+    def testConstructFromThreeDimensionalArray(self):
+        with self.assertRaises(ValueError):
+            libsequence.VariantMatrix(
+                np.array(self.data, dtype=np.int8).reshape(2, 2, 2),
+                np.array(self.pos))
+
+    def testPacked(self):
+        p = self.m.packed
+        self.assertEqual(p.dtype, np.uint64)
+        self.assertEqual(p.shape[0], self.m.nsites)
+        # Rows are padded to 32 bytes
+        self.assertEqual(p.shape[1] % 4, 0)
+        self.assertEqual(p[0][0], 6)
+        self.assertEqual(p[1][0], 8)
+        self.assertTrue(np.all(p[:, 1:] == 0))
+
     def testModifyCppDataViaNumpy(self):
         d = np.array(self.m.data, copy=False)
         with self.assertRaises(ValueError):
             d[0][2] = 4
+        self.m.write_allele(0, 2, 0)
+        self.assertEqual(d[0][2], 0)
+        self.assertEqual(self.m.packed[0][0], 2)
+        with self.assertRaises(ValueError):
+            self.m.write_allele(0, 2, 4)
+
+    def testBufferProtocol(self):
+        a = np.array(self.m, copy=False)
+        self.assertEqual(a.dtype, np.int8)
+        self.assertEqual(a.shape, (self.m.nsites, self.m.nsam))
+        self.assertTrue(np.shares_memory(a, self.m.data))
+
+    def testBufferProtocolReadOnlySource(self):
+        # VariantMatrix.data is read-only, so it is copied
+        m = libsequence.VariantMatrix(self.m.data, self.m.positions)
+        a = np.asarray(m)
+        self.assertEqual(a.dtype, np.int8)
+        self.assertTrue(np.array_equal(a, self.m.data))
+        self.assertTrue(np.shares_memory(a, m.data))
+        self.assertFalse(np.shares_memory(a, self.m.data))
 
     def testFilterSites(self):
         self.assertEqual(self.m.nsites, 2)
@@ -52,6 +103,53 @@ class testVariantMatrix(unittest.TestCase):
             self.m, is_singleton)
         self.assertEqual(self.m.nsites, 1)
 
+    def testFilterSitesFromList(self):
+        # Matrices built from lists are resizable, so
+        # predicates receive a RowView rather than a
+        # ConstRowView.
+        m = libsequence.VariantMatrix(self.data, self.pos)
+        rv = libsequence.filter_sites(m, is_singleton)
+        self.assertEqual(rv, 1)
+        self.assertTrue(np.array_equal(m.positions, [0.1]))
+        m = libsequence.VariantMatrix(self.data, self.pos)
+        rv = libsequence.filter_sites(m, "singleton")
+        self.assertEqual(rv, 1)
+        self.assertTrue(np.array_equal(m.positions, [0.1]))
+
+    def testFilterSitesBuiltin(self):
+        # Predicates evaluated in C++, without Python callbacks
+        with self.assertRaises(ValueError):
+            libsequence.filter_sites(self.m, "unknown")
+        rv = libsequence.filter_sites(self.m, "singleton")
+        self.assertEqual(rv, 1)
+        self.assertEqual(self.m.nsites, 1)
+        self.assertTrue(np.array_equal(self.m.positions, [0.1]))
+        rv = libsequence.filter_sites(self.m, min_count=3)
+        self.assertEqual(rv, 1)
+        self.assertEqual(self.m.nsites, 0)
+
+    def testFilterSitesBuiltinFixed(self):
+        d = np.array([[0, 0, 0, 0], [0, 1, 1, 0], [1, 1, 1, 1]],
+                     dtype=np.int8)
+        m = libsequence.VariantMatrix(d, np.array([0.1, 0.2, 0.3]))
+        rv = libsequence.filter_sites(m, "fixed")
+        self.assertEqual(rv, 2)
+        self.assertTrue(np.array_equal(m.positions, [0.2]))
+        m = libsequence.VariantMatrix(d, np.array([0.1, 0.2, 0.3]))
+        rv = libsequence.filter_sites(m, "polymorphic")
+        self.assertEqual(rv, 1)
+        self.assertTrue(np.array_equal(m.positions, [0.1, 0.3]))
+
+    def testFilterSitesBuiltinNonBinary(self):
+        data = [0, 2, 1, 0, 0, 0, 0, 1]
+        m = libsequence.VariantMatrix(data, self.pos)
+        with self.assertRaises(ValueError):
+            libsequence.filter_sites(m, "singleton")
+        with self.assertRaises(ValueError):
+            libsequence.filter_sites(m, min_count=2)
+        self.assertEqual(m.nsites, 2)
+        self.assertTrue(np.array_equal(m.data.ravel(), data))
+
     def testPickle(self):
         import pickle
         p = pickle.dumps(self.m, -1)
@@ -61,13 +159,36 @@ class testVariantMatrix(unittest.TestCase):
         self.assertEqual(up.nsam, self.m.nsam)
         self.assertEqual(up.nsites, self.m.nsites)
 
+    def testPickleSize(self):
+        import pickle
+        # 0/1 data take one bit per genotype,
+        # with no padding between sites.
+        state = self.m.__getstate__()
+        self.assertEqual(state[0], "packed")
+        self.assertEqual(len(state[3]), 1)
+        d = np.random.RandomState(42).randint(0, 2, size=(3, 65))
+        m = libsequence.VariantMatrix(d.astype(np.int8),
+                                      np.array([0.1, 0.2, 0.3]))
+        self.assertEqual(len(m.__getstate__()[3]), (3 * 65 + 7) // 8)
+        up = pickle.loads(pickle.dumps(m, -1))
+        self.assertTrue(np.array_equal(up.data, d))
+
+    def testPickleNonBinary(self):
+        import pickle
+        m = libsequence.VariantMatrix([0, 2, 1, 0, 0, 0, 0, 1], self.pos)
+        up = pickle.loads(pickle.dumps(m, -1))
+        self.assertTrue(np.array_equal(up.data, m.data))
+        self.assertTrue(np.array_equal(up.positions, m.positions))
+
 
 class testColumnViews(unittest.TestCase):
     @classmethod
     def setUp(self):
         self.data = [0, 1, 1, 0, 0, 0, 0, 1]
         self.pos = [0.1, 0.2]
-        self.m = libsequence.VariantMatrix(self.data, self.pos)
+        self.m = libsequence.VariantMatrix(
+            np.array(self.data, dtype=np.int8).reshape(2, 4),
+            np.array(self.pos))
 
     def testIterateColumns(self):
         for i in range(self.m.nsites):
@@ -78,6 +199,14 @@ class testColumnViews(unittest.TestCase):
         s = [j for j in self.m.site(1)]
         self.assertEqual(s, self.data[self.m.nsam:])
 
+    def testSiteBuffer(self):
+        d = np.array(self.data, dtype=np.int8)
+        d = d.reshape((self.m.nsites, self.m.nsam))
+        for i in range(self.m.nsites):
+            s = np.asarray(self.m.site(i))
+            self.assertEqual(s.dtype, np.int8)
+            self.assertTrue(np.array_equal(s, d[i, :]))
+
     def testIterateRows(self):
         d = np.array(self.data, dtype=np.int8)
         d = d.reshape((self.m.nsites, self.m.nsam))
@@ -86,6 +215,15 @@ class testColumnViews(unittest.TestCase):
             s = np.array([j for j in c], dtype=np.int8)
             self.assertTrue(np.array_equal(s, d[:, i]))
 
+    def testPackedSamples(self):
+        p = self.m.packed_samples
+        self.assertEqual(p.shape[0], self.m.nsam)
+        d = np.array(self.data, dtype=np.int8)
+        d = d.reshape((self.m.nsites, self.m.nsam))
+        for i in range(self.m.nsam):
+            bits = [(int(p[i][0]) >> j) & 1 for j in range(self.m.nsites)]
+            self.assertEqual(bits, list(d[:, i]))
+
 
 class testCreationFromNumpy(unittest.TestCase):
     @classmethod
@@ -123,6 +261,11 @@ class testCreationFromNumpy(unittest.TestCase):
         libsequence.filter_sites(self.m, is_singleton)
         self.assertEqual(self.m.nsites, 1)
 
+    def testFilterSitesBuiltin(self):
+        rv = libsequence.filter_sites(self.m, "polymorphic")
+        self.assertEqual(rv, 2)
+        self.assertEqual(self.m.nsites, 0)
+
     def testFilterSites2(self):
         rv = libsequence.filter_sites(self.m, RemoveNonRefSingletons())
         self.assertEqual(rv, 1)
@@ -0,0 +1,70 @@
+import unittest
+import importlib.util
+import subprocess
+import sys
+
+# msstats_cli requires pandas, which is not a dependency
+# of the package itself.
+HAVE_PANDAS = importlib.util.find_spec("pandas") is not None
+
+
+def ms_input(nreps, nsam=6):
+    """
+    Replicates in "ms" format, each with
+    a different number of segregating sites.
+    """
+    lines = []
+    for rep in range(nreps):
+        nsites = 1 + rep % 7
+        lines.append("//")
+        lines.append("segsites: {}".format(nsites))
+        lines.append("positions: " + " ".join(
+            "{:.4f}".format((i + 1) / (nsites + 1)) for i in range(nsites)))
+        for sample in range(nsam):
+            lines.append("".join(str(((rep + 1) * (sample + 1) >> i) & 1)
+                                 for i in range(nsites)))
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def run_msstats(code, nreps):
+    return subprocess.run(
+        [sys.executable, "-c",
+         "from libsequence.msstats_cli import msstats_main\n" + code],
+        input=ms_input(nreps), stdout=subprocess.PIPE, check=True,
+        universal_newlines=True).stdout
+
+
+@unittest.skipIf(HAVE_PANDAS is False, "pandas is required")
+class test_msstats_stdout(unittest.TestCase):
+    nreps = 40
+
+    def testTable(self):
+        out = run_msstats("msstats_main([])", self.nreps).splitlines()
+        self.assertEqual(out[0].split('\t'), ['rep', 'thetapi', 'thetaw',
+                                              'thetah', 'tajd', 'S',
+                                              'singletons', 'dsingletons'])
+        self.assertEqual(len(out), self.nreps + 1)
+        reps = [int(i.split('\t')[0]) for i in out[1:]]
+        self.assertEqual(reps, list(range(self.nreps)))
+
+    def testJobsPreservesOrder(self):
+        serial = run_msstats("msstats_main(['-g'])", self.nreps)
+        parallel = run_msstats("msstats_main(['-g', '--jobs', '2'])",
+                               self.nreps)
+        self.assertEqual(serial, parallel)
+
+    def testRedirectedStdout(self):
+        # io.StringIO has no file descriptor
+        code = "\n".join(["import contextlib, io, sys",
+                          "buf = io.StringIO()",
+                          "with contextlib.redirect_stdout(buf):",
+                          "    msstats_main([])",
+                          "sys.stdout.write(buf.getvalue())"])
+        redirected = run_msstats(code, self.nreps)
+        self.assertEqual(redirected, run_msstats("msstats_main([])",
+                                                 self.nreps))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import libsequence
+import numpy as np
 
 class test_nSL(unittest.TestCase):
     @classmethod
@@ -25,6 +26,65 @@ class test_nSL(unittest.TestCase):
     def test_classic_stats(self):
         p = libsequence.PolySIM(self.x)
         hp = p.hprime()
+
+class test_garud_statistics(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        d = [(0.1,"01010101"),(0.2,"01111111"),
+             (0.3,"00011101"),(0.4,"11111000"),
+             (0.5,"01010101"),(0.6,"00001111")
+             ]
+        self.x = libsequence.SimData(d)
+        self.d = np.array([[int(i) for i in s] for _, s in d],
+                          dtype=np.int8)
+        self.pos = [p for p, _ in d]
+
+    def test_matches_garudStats(self):
+        m = libsequence.VariantMatrix(self.d, self.pos)
+        g = libsequence.garudStats(self.x)
+        gm = libsequence.garud_statistics(m)
+        self.assertAlmostEqual(g['H1'], gm.H1)
+        self.assertAlmostEqual(g['H12'], gm.H12)
+        self.assertAlmostEqual(g['H2H1'], gm.H2H1)
+
+    def test_non_binary_data(self):
+        # Not 0/1, so the bit-packed path is not taken
+        m = libsequence.VariantMatrix(self.d, self.pos)
+        m2 = libsequence.VariantMatrix(2 * self.d, self.pos)
+        g = libsequence.garud_statistics(m)
+        g2 = libsequence.garud_statistics(m2)
+        self.assertAlmostEqual(g.H1, g2.H1)
+        self.assertAlmostEqual(g.H12, g2.H12)
+        self.assertAlmostEqual(g.H2H1, g2.H2H1)
+
+class test_PackedSummary(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        d = ["01010101", "01111111", "00011101",
+             "11111000", "00000000", "00001111"]
+        self.d = np.array([[int(i) for i in s] for s in d],
+                          dtype=np.int8)
+        self.m = libsequence.VariantMatrix(
+            self.d, np.linspace(0.1, 0.6, self.d.shape[0]))
+
+    def test_derived_allele_counts(self):
+        c = libsequence.derived_allele_counts(self.m)
+        self.assertEqual(c, list(self.d.sum(axis=1)))
+
+    def test_packed_summary(self):
+        s = libsequence.packed_summary(self.m)
+        c = self.d.sum(axis=1)
+        n = self.d.shape[1]
+        self.assertEqual(s.S, np.count_nonzero((c > 0) & (c < n)))
+        self.assertEqual(s.singletons, np.count_nonzero(
+            (c == 1) | (c == n - 1)))
+        self.assertEqual(s.dsingletons, np.count_nonzero(c == 1))
+
+    def test_packed_thetapi(self):
+        ac = libsequence.AlleleCountMatrix(self.m)
+        self.assertAlmostEqual(libsequence.packed_thetapi(self.m),
+                               libsequence.thetapi(ac))
+
 if __name__ == '__main__':
     unittest.main()
         